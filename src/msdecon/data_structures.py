@@ -3,13 +3,16 @@ Data structure classes and constants used throughout the package.
 """
 
 import dataclasses
+from functools import cached_property
 from typing import List, Tuple, Optional
 
+import numpy as np
+
 NEUTRON_MASS = 1.00866491578
 PROTON_MASS = 1.007276466812
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Peak:
     """
     Represents a single peak with its m/z (mass-to-charge)
@@ -20,7 +23,7 @@ class Peak:
     index: Optional[int] = None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class IsotopeGap:
     """
     Stores information about isotope spacing between two peaks.
@@ -36,9 +39,20 @@ class DeconvolutedPeak:
     """
     Represents the result of deconvolution on an isotopic envelope,
     capturing the monoisotopic peak, the largest peak, and overall info.
+
+    The peak m/z and intensity values are gathered into arrays once at
+    construction and the aggregate properties are cached, so peaks and charge
+    should not be modified after the object is created.
     """
     peaks: List[Peak]
     charge: Optional[int]
+    _mz: np.ndarray = dataclasses.field(init=False, repr=False, compare=False)
+    _intensities: np.ndarray = dataclasses.field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._mz = np.fromiter((p.mz for p in self.peaks), dtype=np.float64, count=len(self.peaks))
+        self._intensities = np.fromiter((p.intensity for p in self.peaks), dtype=np.float64,
+                                        count=len(self.peaks))
 
     @property
     def base_peak(self) -> Peak:
@@ -47,12 +61,12 @@ class DeconvolutedPeak:
         """
         return self.peaks[0]
 
-    @property
+    @cached_property
     def largest_peak(self) -> Peak:
         """
         Returns the largest peak from the list of peaks.
         """
-        return max(self.peaks, key=lambda x: x.intensity)
+        return self.peaks[int(self._intensities.argmax())]
 
     @property
     def mz_window(self) -> Tuple[float, float]:
@@ -68,12 +82,12 @@ class DeconvolutedPeak:
         """
         return self.peaks[0].intensity, self.peaks[-1].intensity
 
-    @property
+    @cached_property
     def total_intensity(self) -> float:
         """
         Returns the total intensity of the isotopic envelope.
         """
-        return sum(p.intensity for p in self.peaks)
+        return float(self._intensities.sum())
 
     @property
     def num_peaks(self) -> int:
@@ -98,41 +112,52 @@ class DeconvolutedPeak:
             return None
         return self.largest_peak.mz * self.charge - self.charge * charge_carrier
 
-    @property
-    def isotope_gaps_mz(self) -> List[float]:
+    @cached_property
+    def isotope_gaps_mz(self) -> np.ndarray:
         """
-        Returns a list of IsotopeGap objects between peaks.
+        Returns an array of m/z gaps between consecutive peaks.
         """
-        gaps = []
-        for i in range(1, len(self.peaks)):
-            gap = self.peaks[i].mz - self.peaks[i - 1].mz
-            gaps.append(gap)
+        return np.diff(self._mz)
 
-        return gaps
-
-    @property
-    def isotope_gaps_neutral_mass(self) -> List[float]:
+    @cached_property
+    def isotope_gaps_neutral_mass(self) -> np.ndarray:
         """
-        Returns a list of IsotopeGap objects between peaks.
+        Returns an array of neutral mass gaps between consecutive peaks
+        (NaN if the charge is unknown).
         """
-        isotope_gaps = self.isotope_gaps_mz
-        gaps = []
-        for gap in isotope_gaps:
-            gaps.append(gap * self.charge)
+        if self.charge is None:
+            return np.full(len(self.isotope_gaps_mz), np.nan)
+        return self.isotope_gaps_mz * self.charge
 
-        return gaps
-
-    @property
-    def isotope_gaps_ppm_error(self) -> List[float]:
+    @cached_property
+    def isotope_gaps_ppm_error(self) -> np.ndarray:
         """
-        Returns a list of ppm errors associated with isotope gaps.
+        Returns an array of ppm errors associated with isotope gaps
+        (NaN if the charge is unknown).
         """
-        gap_errors = []
-        for i in range(1, len(self.peaks)):
-            gap_errors.append((self.peaks[i - 1].mz + (NEUTRON_MASS / self.charge) - self.peaks[i].mz) /
-                              self.peaks[i].mz * 1e6)
+        if self.charge is None:
+            return np.full(len(self.isotope_gaps_mz), np.nan)
+        return (self._mz[:-1] + (NEUTRON_MASS / self.charge) - self._mz[1:]) / self._mz[1:] * 1e6
+
+
+def neutral_masses(
+        dpeaks: List[DeconvolutedPeak],
+        charge_carrier: float = PROTON_MASS
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the base peak and largest peak neutral (uncharged) masses of all
+    envelopes as two arrays, computed in one vectorized pass instead of calling
+    base_peak_neutral_mass/largest_peak_neutral_mass per envelope. Envelopes
+    with an unknown charge get NaN.
+    """
+    count = len(dpeaks)
+    charges = np.fromiter((np.nan if d.charge is None else d.charge for d in dpeaks), dtype=np.float64, count=count)
+    base_mz = np.fromiter((d.base_peak.mz for d in dpeaks), dtype=np.float64, count=count)
+    largest_mz = np.fromiter((d.largest_peak.mz for d in dpeaks), dtype=np.float64, count=count)
 
-        return gap_errors
+    base_mass = base_mz * charges - charges * charge_carrier
+    largest_mass = largest_mz * charges - charges * charge_carrier
+    return base_mass, largest_mass
 
 
 class GraphNode:
@@ -140,6 +165,7 @@ class GraphNode:
     Node wrapper for rustworkx PyGraph nodes, tagging each node with
     the original peak data and an index.
     """
+    __slots__ = ('index', 'value', 'seen')
 
     def __init__(self, value: Peak):
         self.index = None
@@ -154,6 +180,7 @@ class GraphEdge:
     """
     Edge wrapper for rustworkx PyGraph edges, carrying isotope gap info.
     """
+    __slots__ = ('index', 'value')
 
     def __init__(self, value: IsotopeGap):
         self.index = None
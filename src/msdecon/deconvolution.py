@@ -3,10 +3,118 @@ Main deconvolution function that uses the graph operations and navigation
 methods to identify isotopic envelopes among the provided peaks.
 """
 
+import numpy as np
+from numba import njit
 from typing import List, Tuple, Literal
-from .graph_ops import construct_graph
-from .navigation import navigate_left, navigate_right
-from .data_structures import DeconvolutedPeak
+from .graph_ops import construct_graph, construct_csr
+from .navigation import navigate_dir
+from .data_structures import DeconvolutedPeak, Peak
+
+
+@njit(cache=True)
+def deconvolute_core(
+        intensity: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        min_charge: int,
+        max_charge: int,
+        max_left_decrease: float,
+        max_right_decrease: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compiled core of deconvolute, working on the peak intensities and the CSR
+    adjacency from construct_csr.
+
+    Returns:
+        (envelope_peaks, envelope_bounds, envelope_charges): the peaks of
+        envelope k are envelope_peaks[envelope_bounds[k]:envelope_bounds[k + 1]]
+        in m/z order, and its charge is envelope_charges[k] (0 if unknown).
+    """
+    num_peaks = intensity.shape[0]
+    rows_per_charge = 2 * num_peaks
+    num_rows = indptr.shape[0] - 1
+    seen = np.zeros(num_peaks, dtype=np.bool_)
+
+    # Seen neighbors are compacted out of the CSR rows as the search goes, so
+    # work on a copy of indices with a movable end for every row, and keep the
+    # number of unseen neighbors of each peak
+    indices = indices.copy()
+    row_end = indptr[1:].copy()
+    live_degree = np.zeros(num_peaks, dtype=np.int64)
+    for row in range(num_rows):
+        live_degree[(row // 2) % num_peaks] += indptr[row + 1] - indptr[row]
+
+    # Every peak ends up in exactly one envelope
+    envelope_peaks = np.empty(num_peaks, dtype=np.int32)
+    envelope_bounds = np.zeros(num_peaks + 1, dtype=np.int64)
+    envelope_charges = np.zeros(num_peaks, dtype=np.int32)
+    num_envelopes = 0
+    num_written = 0
+
+    # Sort peaks by intensity descending (stable, so equal intensities keep input order)
+    for peak_idx in np.argsort(-intensity, kind='mergesort'):
+        # Skip if peak is already visited
+        if seen[peak_idx]:
+            continue
+
+        # Attempt each charge from highest to lowest, build a set of candidate
+        # peaks by navigating left/right and keep the best (highest total
+        # intensity) profile; ties go to the higher charge. A peak without
+        # unseen neighbors, or a charge with no edges at this peak, can only
+        # yield the peak on its own, so it is scored without navigating.
+        seed_profile = np.full(1, peak_idx, dtype=np.int32)
+        best_profile = seed_profile
+        best_charge = 0
+        best_intensity = -np.inf
+        for charge in range(max_charge, min_charge - 1, -1):
+            first_row = (charge - min_charge) * rows_per_charge
+            seed_row = first_row + 2 * peak_idx
+            if (live_degree[peak_idx] == 0
+                    or (row_end[seed_row] == indptr[seed_row] and row_end[seed_row + 1] == indptr[seed_row + 1])):
+                peaks_in_profile = seed_profile
+            else:
+                charge_indptr = indptr[first_row:first_row + rows_per_charge + 1]
+                charge_row_end = row_end[first_row:first_row + rows_per_charge]
+                left_peaks = navigate_dir(intensity, seen, charge_indptr, charge_row_end, indices, live_degree,
+                                          peak_idx, max_left_decrease, -1)
+                right_peaks = navigate_dir(intensity, seen, charge_indptr, charge_row_end, indices, live_degree,
+                                           peak_idx, max_right_decrease, 1)
+
+                # Both paths start at the seed and move monotonically in m/z, so
+                # joining the reversed left path with the right path gives the
+                # envelope in m/z order without duplicates
+                peaks_in_profile = np.concatenate((left_peaks[:0:-1], right_peaks))
+
+            total_intensity = intensity[peaks_in_profile].sum()
+            if total_intensity > best_intensity:
+                best_intensity = total_intensity
+                best_profile = peaks_in_profile
+                best_charge = charge
+
+        # If only a single peak is found, we treat charge as unknown.
+        if best_profile.shape[0] == 1:
+            best_charge = 0
+
+        # Mark all peaks in the best profile as seen and record the envelope
+        for p in best_profile:
+            seen[p] = True
+            envelope_peaks[num_written] = p
+            num_written += 1
+
+        # The CSR is symmetric, so the unseen neighbors of a newly seen peak
+        # are exactly the peaks that just lost a live neighbor
+        for p in best_profile:
+            for c in range(max_charge - min_charge + 1):
+                first_row = (c * num_peaks + p) * 2
+                for row in range(first_row, first_row + 2):
+                    for k in range(indptr[row], row_end[row]):
+                        if not seen[indices[k]]:
+                            live_degree[indices[k]] -= 1
+        envelope_charges[num_envelopes] = best_charge
+        num_envelopes += 1
+        envelope_bounds[num_envelopes] = num_written
+
+    return envelope_peaks, envelope_bounds[:num_envelopes + 1], envelope_charges[:num_envelopes]
 
 
 def deconvolute(
@@ -24,6 +132,8 @@ def deconvolute(
       3. Iterates over peaks in descending intensity,
          navigating left and right to form isotopic envelopes.
 
+    Steps 2 and 3 run in the compiled deconvolute_core.
+
     Args:
         peaks: A list of (mz, intensity) tuples.
         tolerance: Numeric tolerance (in ppm or da).
@@ -35,45 +145,24 @@ def deconvolute(
         A list of DeconvolutedPeak objects containing identified isotopic envelopes.
     """
     graph = construct_graph(peaks, tolerance, tolerance_type, charge_range)
+    mz, intensity = graph.attrs['mz'], graph.attrs['intensity']
+    indptr, indices = construct_csr(graph, charge_range)
 
-    # For quick peak lookup
-    indexed_peaks = {i: p for i, p in enumerate(peaks)}
-    dpeaks = []
-
-    # Sort peaks by intensity descending
-    sorted_peaks = sorted(range(len(peaks)), key=lambda x: indexed_peaks[x][1], reverse=True)
+    envelope_peaks, envelope_bounds, envelope_charges = deconvolute_core(
+        intensity, indptr, indices,
+        charge_range[0], charge_range[1], max_left_decrease, max_right_decrease
+    )
 
-    for peak_idx in sorted_peaks:
-        # Skip if peak is already visited
-        if graph[peak_idx].seen:
-            continue
+    mz_values, intensity_values = mz.tolist(), intensity.tolist()
+    envelope_peaks = envelope_peaks.tolist()
+    bounds = envelope_bounds.tolist()
 
-        # Attempt each charge from highest to lowest,
-        # build a set of candidate peaks using navigate_left/right
-        results = {}
-        for charge in range(charge_range[1], charge_range[0] - 1, -1):
-            left_peaks = navigate_left(graph, peak_idx, charge, max_left_decrease)
-            right_peaks = navigate_right(graph, peak_idx, charge, max_right_decrease)
-            peaks_in_profile = sorted(set(left_peaks + right_peaks))
-
-            decon_peak = DeconvolutedPeak(
-                peaks=[graph[p].value for p in peaks_in_profile],
-                charge=charge,
-            )
-            results[charge] = decon_peak
-
-        # Pick the best (highest total intensity) result among tested charges
-        best_charge = max(results, key=lambda c: results[c].total_intensity)
-        best_result = results[best_charge]
-
-        # If only a single peak is found, we treat charge as unknown (None).
-        if best_result.num_peaks == 1:
-            best_result.charge = None
-
-        # Mark all peaks in the best_result as seen
-        for p_idx in best_result.peaks:
-            graph[p_idx.index].seen = True
-
-        dpeaks.append(best_result)
+    dpeaks = []
+    for k, charge in enumerate(envelope_charges.tolist()):
+        dpeaks.append(DeconvolutedPeak(
+            peaks=[Peak(mz=mz_values[p], intensity=intensity_values[p], index=p)
+                   for p in envelope_peaks[bounds[k]:bounds[k + 1]]],
+            charge=charge if charge else None,
+        ))
 
     return dpeaks
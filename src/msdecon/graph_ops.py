@@ -2,20 +2,23 @@
 Graph construction and subgraph separation utilities.
 """
 
+import numpy as np
 import rustworkx as rx
-from typing import List, Tuple, Literal, Dict
-from .data_structures import Peak, GraphNode, GraphEdge, NEUTRON_MASS
+from typing import List, Tuple, Literal
+from .data_structures import NEUTRON_MASS
 
 
 def get_tolerance(mz: float, tolerance: float, tolerance_type: Literal['ppm', 'da']) -> float:
     """
     Returns the absolute tolerance in Da, given a base m/z and either
-    a parts-per-million (ppm) or Dalton (da) setting.
+    a parts-per-million (ppm) or Dalton (da) setting. mz may also be an
+    array, in which case the ppm tolerances are computed element-wise.
     """
     if tolerance_type == 'ppm':
         return mz * tolerance / 1e6
     elif tolerance_type == 'da':
         return tolerance
+    raise ValueError(f"tolerance_type must be 'ppm' or 'da', got {tolerance_type!r}")
 
 
 def construct_graph(
@@ -27,56 +30,97 @@ def construct_graph(
     """
     Constructs a rustworkx PyGraph from a list of (mz, intensity) peaks,
     adding edges between peaks if they fall within the expected isotope spacing.
+
+    Node payloads are the integer peak indices. The peak values are stored as
+    contiguous float64 arrays in graph.attrs['mz'] and graph.attrs['intensity'].
+
+    Edge payloads are integer rows into a columnar edge table stored in
+    graph.attrs['edge_offset'], ['edge_charge'], ['edge_mz_error'] and
+    ['edge_ppm_error'].
     """
-    graph = rx.PyGraph()
-    graph.add_nodes_from([GraphNode(Peak(mz=mz, intensity=intensity, index=i)) for i, (mz, intensity)
-                          in enumerate(peaks)])
+    if charge_range[0] < 1 or charge_range[0] > charge_range[1]:
+        raise ValueError(f"charge_range must be (min_charge, max_charge) with 1 <= min_charge <= max_charge, "
+                         f"got {charge_range!r}")
 
-    for index in graph.node_indices():
-        # Assign node indices for easy reference
-        graph[index].index = index
+    peak_array = np.asarray(peaks, dtype=np.float64).reshape(-1, 2)
+    mz = np.ascontiguousarray(peak_array[:, 0])
+    intensity = np.ascontiguousarray(peak_array[:, 1])
 
-    # Determine the smallest and largest offset for the given charge range
-    min_isotope_offset = NEUTRON_MASS / charge_range[1]
-    max_isotope_offset = NEUTRON_MASS / charge_range[0]
+    graph = rx.PyGraph(attrs={'mz': mz, 'intensity': intensity})
+    graph.add_nodes_from(range(len(mz)))
+
+    # Work on the peaks in m/z order, keeping the original indices for the graph
+    order = np.argsort(mz, kind='stable')
+    sorted_mz = mz[order]
+    tols = np.broadcast_to(get_tolerance(sorted_mz, tolerance, tolerance_type), sorted_mz.shape)
 
     # Precompute valid offsets for each charge
-    valid_isotope_offsets = []
-    for charge in range(charge_range[0], charge_range[1] + 1):
-        valid_isotope_offsets.append((charge, NEUTRON_MASS / charge))
-
-    # Loop over peaks and connect them if they match an isotope offset
-    for i in range(len(peaks)):
-        for j in range(i + 1, len(peaks)):
-            mz_i = peaks[i][0]
-            mz_j = peaks[j][0]
-            mz_diff = abs(mz_j - mz_i)
-
-            tol = get_tolerance(mz_i, tolerance, tolerance_type)
-
-            # If difference is too small or too large, skip early
-            if mz_diff < min_isotope_offset - tol:
-                continue
-            if mz_diff > max_isotope_offset + tol:
-                break
-
-            # Check potential matches for each possible charge
-            for charge, offset in valid_isotope_offsets:
-                if abs(mz_diff - offset) <= tol:
-                    from .data_structures import IsotopeGap  # local import is fine if needed
-                    ppm_error = (mz_diff - offset) / mz_i * 1e6
-                    peak_edge = GraphEdge(
-                        IsotopeGap(
-                            offset=offset,
-                            charge=charge,
-                            mz_error=mz_diff - offset,
-                            ppm_error=ppm_error
-                        )
-                    )
-                    graph.add_edge(i, j, peak_edge)
-
-    # Assign edge indices for easy reference
-    for index, data in graph.edge_index_map().items():
-        data[2].index = index
+    charges = list(range(charge_range[0], charge_range[1] + 1))
+    offsets = NEUTRON_MASS / np.asarray(charges, dtype=np.float64)
+    min_isotope_offset = offsets.min()
+    max_isotope_offset = offsets.max()
+
+    # For each peak, the window of later peaks that could be an isotope offset away
+    lo_idx = np.searchsorted(sorted_mz, sorted_mz + min_isotope_offset - tols, 'left')
+    lo_idx = np.maximum(lo_idx, np.arange(1, len(sorted_mz) + 1))
+    hi_idx = np.searchsorted(sorted_mz, sorted_mz + max_isotope_offset + tols, 'right')
+    window_sizes = np.maximum(hi_idx - lo_idx, 0)
+
+    # Flatten all windows into (i, j) candidate pairs, so the total work is
+    # proportional to the number of in-window pairs rather than N^2
+    i_idx = np.repeat(np.arange(len(sorted_mz)), window_sizes)
+    window_starts = np.cumsum(window_sizes) - window_sizes
+    j_idx = np.arange(len(i_idx)) - np.repeat(window_starts - lo_idx, window_sizes)
+
+    # Check potential matches for each possible charge
+    mz_errors = (sorted_mz[j_idx] - sorted_mz[i_idx])[:, None] - offsets[None, :]
+    pair_idx, charge_idx = np.nonzero(np.abs(mz_errors) <= tols[i_idx][:, None])
+    i_idx, j_idx = i_idx[pair_idx], j_idx[pair_idx]
+    mz_errors = mz_errors[pair_idx, charge_idx]
+    ppm_errors = mz_errors / sorted_mz[i_idx] * 1e6
+    src, dst = order[i_idx], order[j_idx]
+
+    # Columnar edge table; each graph edge carries its row index as payload
+    edge_charge = np.asarray(charges, dtype=np.int64)[charge_idx]
+    graph.attrs['edge_offset'] = offsets[charge_idx]
+    graph.attrs['edge_charge'] = edge_charge
+    graph.attrs['edge_mz_error'] = mz_errors
+    graph.attrs['edge_ppm_error'] = ppm_errors
+
+    graph.add_edges_from(list(zip(src.tolist(), dst.tolist(), range(len(edge_charge)))))
 
     return graph
+
+
+def construct_csr(graph: rx.PyGraph, charge_range: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Flattens the graph edges into a CSR adjacency in a single pass over the
+    edge list. Rows are grouped by charge, and each node has two rows per
+    charge: one for its neighbors at lower m/z and one for those at higher m/z.
+    For charge z, node i and side s (0 = lower, 1 = higher m/z) the neighbors are
+    indices[indptr[row]:indptr[row + 1]] with
+    row = ((z - charge_range[0]) * num_nodes + i) * 2 + s.
+    Neighbors are ordered by node index, and multi-edges between two peaks
+    become separate entries.
+    """
+    mz = graph.attrs['mz']
+    num_rows = 2 * graph.num_nodes()
+    num_charges = charge_range[1] - charge_range[0] + 1
+    edge_list = np.asarray(graph.edge_list(), dtype=np.int32).reshape(-1, 2)
+    charges = graph.attrs['edge_charge'][np.asarray(graph.edges(), dtype=np.int64)]
+
+    # Each undirected edge is listed under both of its nodes; peaks at the
+    # same m/z can never be navigated between and are left out
+    src = np.concatenate((edge_list[:, 0], edge_list[:, 1]))
+    dst = np.concatenate((edge_list[:, 1], edge_list[:, 0]))
+    keep = mz[dst] != mz[src]
+    src, dst = src[keep], dst[keep]
+    side = mz[dst] > mz[src]
+    rows = np.tile(charges - charge_range[0], 2)[keep] * num_rows + 2 * src + side
+    order = np.lexsort((dst, rows))
+
+    indptr = np.zeros(num_charges * num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_charges * num_rows), out=indptr[1:])
+    indices = np.ascontiguousarray(dst[order])
+
+    return indptr, indices
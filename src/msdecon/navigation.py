@@ -3,97 +3,75 @@ Functions to traverse (navigate) left or right in the graph based on
 peak intensity and m/z relationships.
 """
 
-import rustworkx as rx
-from typing import List
-
-
-def navigate_left(
-        graph: rx.PyGraph,
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def navigate_dir(
+        intensity: np.ndarray,
+        seen: np.ndarray,
+        indptr: np.ndarray,
+        row_end: np.ndarray,
+        indices: np.ndarray,
+        live_degree: np.ndarray,
         start_node_idx: int,
-        charge: int,
-        max_intensity_change: float
-) -> List[int]:
+        max_intensity_change: float,
+        direction: int
+) -> np.ndarray:
     """
-    Navigates left in m/z space (toward smaller m/z), collecting connected peaks
-    of the same charge while ensuring each next peak's intensity is not too large
-    a drop from the current peak.
+    Navigates in m/z space (direction -1 toward smaller m/z, +1 toward larger m/z)
+    over the CSR rows of a single charge, collecting connected peaks while
+    ensuring each next peak's intensity is not too large a drop from the current peak.
+    At each step the most intense valid neighbor is taken. indptr and row_end are
+    the slices of the row starts and ends belonging to one charge, and only the row
+    on the requested side of the current peak is scanned.
+
+    Seen neighbors are compacted out of each scanned row in place (row_end is moved
+    down, keeping the order of the remaining entries), so later scans do not touch
+    them again. Peaks whose live_degree (number of unseen neighbors over all
+    charges) is zero end the path without scanning.
     """
+    side = 1 if direction > 0 else 0
+    path = np.empty(64, dtype=np.int32)
+    path[0] = start_node_idx
+    path_len = 1
     current_node = start_node_idx
-    path = [current_node]
 
-    while True:
-        neighbors = graph.neighbors(current_node)
-        valid_next = []
-        current_mz = graph[current_node].value.mz
-
-        for n in neighbors:
-            edge_data_list = graph.get_edge_data(current_node, n)
-            # Edge data might be a single edge or list of edges
-            for edge_data in (edge_data_list if isinstance(edge_data_list, list) else [edge_data_list]):
-                if (edge_data.value.charge == charge
-                        and graph[n].value.intensity < graph[current_node].value.intensity
-                        and graph[n].value.mz < current_mz
-                        and not graph[n].seen
-                        and (
-                                (graph[current_node].value.intensity - graph[n].value.intensity)
-                                / graph[current_node].value.intensity
-                        ) < max_intensity_change):
-                    valid_next.append((graph[n].value.intensity, n))
+    while live_degree[current_node] > 0:
+        row = 2 * current_node + side
+        current_intensity = intensity[current_node]
+        best_intensity = -np.inf
+        best_node = -1
+
+        write = indptr[row]
+        for k in range(indptr[row], row_end[row]):
+            n = indices[k]
+            if seen[n]:
+                continue
+            indices[write] = n
+            write += 1
+
+            n_intensity = intensity[n]
+            if (n_intensity < current_intensity
+                    and (current_intensity - n_intensity) / current_intensity < max_intensity_change
+                    and n_intensity > best_intensity):
+                best_intensity = n_intensity
+                best_node = n
+        row_end[row] = write
 
         # If no valid next peaks, break
-        if not valid_next:
+        if best_node < 0:
             break
 
-        # Select the neighbor with the largest intensity
-        valid_next.sort(key=lambda x: x[0], reverse=True)
-        next_node = valid_next[0][1]
-
-        path.append(next_node)
-        current_node = next_node
-
-    return path
-
-
-def navigate_right(
-        graph: rx.PyGraph,
-        start_node_idx: int,
-        charge: int,
-        max_intensity_change: float
-) -> List[int]:
-    """
-    Navigates right in m/z space (toward larger m/z), collecting connected peaks
-    of the same charge while ensuring each next peak's intensity is not too large
-    a drop from the current peak.
-    """
-    current_node = start_node_idx
-    path = [current_node]
-
-    while True:
-        neighbors = graph.neighbors(current_node)
-        valid_next = []
-        current_mz = graph[current_node].value.mz
-
-        for n in neighbors:
-            edge_data_list = graph.get_edge_data(current_node, n)
-            for edge_data in (edge_data_list if isinstance(edge_data_list, list) else [edge_data_list]):
-                if (edge_data.value.charge == charge
-                        and graph[n].value.intensity < graph[current_node].value.intensity
-                        and graph[n].value.mz > current_mz
-                        and not graph[n].seen
-                        and (
-                                (graph[current_node].value.intensity - graph[n].value.intensity)
-                                / graph[current_node].value.intensity
-                        ) < max_intensity_change):
-                    valid_next.append((graph[n].value.intensity, n))
-
-        # If no valid next peaks, break
-        if not valid_next:
-            break
+        if path_len == path.shape[0]:
+            grown = np.empty(2 * path_len, dtype=np.int32)
+            grown[:path_len] = path
+            path = grown
 
-        valid_next.sort(key=lambda x: x[0], reverse=True)
-        next_node = valid_next[0][1]
+        path[path_len] = best_node
+        path_len += 1
+        current_node = best_node
 
-        path.append(next_node)
-        current_node = next_node
+    return path[:path_len]
 
-    return path
@@ -4,6 +4,10 @@ It takes input spectra in (mz intensity) format, filters by intensity, and then
 deconvolute function from msdecon to identify monoisotopic peaks and assign charge states.
 """
 
+import io
+import os
+import sys
+
 import numpy as np
 import streamlit as st
 import matplotlib.pyplot as plt
@@ -11,7 +15,10 @@ import matplotlib.colors as mcolors
 import plotly.graph_objects as go
 import pandas as pd
 
-from src.msdecon.deconvolution import deconvolute
+# Import the package as msdecon (not src.msdecon): Numba's on-disk cache records the
+# module name, so importing the same files under two names breaks the cached kernels
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from msdecon.deconvolution import deconvolute
 
 st.set_page_config(
     page_title="MsDecon",
@@ -23,6 +30,16 @@ st.set_page_config(
     }
 )
 
+
+@st.cache_data(show_spinner=False)
+def load_default_spectra():
+    """
+    Reads the example spectrum shown in the text area on first load.
+    """
+    with open('default_spectra.txt', 'r') as f:
+        return f.read()
+
+
 with st.sidebar:
     st.title('Deconvolute Mass Spectra :bar_chart:')
 
@@ -34,7 +51,7 @@ with st.sidebar:
 
 
     # read default spectra 'default_spectra.txt'
-    default_spectra = open('default_spectra.txt', 'r').read()
+    default_spectra = load_default_spectra()
 
     # mz intensity\n
     spectra = st.text_area('Paste spectra here', default_spectra, height=125,
@@ -81,30 +98,68 @@ with st.sidebar:
     """)
     #deconvolute_min_intensity = st.number_input('Deconvolution min intensity', value=0.1)
 
+@st.cache_data(show_spinner=False)
+def parse_peaks(spectra, min_intensity):
+    """
+    Parses 'mz intensity' lines, drops peaks below min_intensity and returns
+    the m/z and intensity arrays sorted by m/z.
+    """
+    spectra_array = np.loadtxt(io.StringIO(spectra), dtype=np.float64, usecols=(0, 1), ndmin=2)
+    mz_array, intensity_array = spectra_array[:, 0], spectra_array[:, 1]
+
+    # Filter by minimum intensity
+    intensity_mask = intensity_array >= min_intensity
+    mz_array, intensity_array = mz_array[intensity_mask], intensity_array[intensity_mask]
+
+    # sort peaks by mz
+    mz_order = np.argsort(mz_array, kind='stable')
+    return mz_array[mz_order], intensity_array[mz_order]
+
+
 # Validate and parse input
-lines = [line.strip() for line in spectra.split('\n') if line.strip()]
 try:
-    mz_array = [float(line.split()[0]) for line in lines]
-    intensity_array = [float(line.split()[1]) for line in lines]
+    mz_array, intensity_array = parse_peaks(spectra, min_intensity)
 except (ValueError, IndexError):
     st.error("Invalid input format. Please ensure each line contains 'mz intensity' separated by a space.")
     st.stop()
 
-peaks = [(mz, intensity) for mz, intensity in zip(mz_array, intensity_array)]
-
-# Filter by minimum intensity and sort
-peaks = list(filter(lambda x: x[1] >= min_intensity, peaks))
-if len(peaks) == 0:
+if len(mz_array) == 0:
     st.stop()
 
-if len(peaks) > 10_000:
+if len(mz_array) > 10_000:
     st.warning('Too many peaks. Please reduce the number of peaks')
     st.stop()
 
-# sort peaks by mz
-peaks = sorted(peaks, key=lambda x: x[0])
-
 
+def stems(mz, intensity):
+    """
+    Returns x, y arrays that draw each peak as a vertical line from 0 to its
+    intensity, with NaN separators between peaks.
+    """
+    x = np.empty(3 * len(mz))
+    y = np.empty_like(x)
+    x[0::3] = mz
+    x[1::3] = mz
+    x[2::3] = np.nan
+    y[0::3] = 0
+    y[1::3] = intensity
+    y[2::3] = np.nan
+    return x, y
+
+
+def stem_hovertext(labels):
+    """
+    Returns the hovertext list matching the vertices produced by stems(),
+    with each label only on the top point of its stem.
+    """
+    hovertext = np.empty(3 * len(labels), dtype=object)
+    hovertext[0::3] = None
+    hovertext[1::3] = labels
+    hovertext[2::3] = None
+    return hovertext.tolist()
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
 def run_deconvolution(peaks, charge_range, tolerance, tolerance_type, max_left_decrease, max_right_decrease):
     return deconvolute(
         peaks,
@@ -117,7 +172,7 @@ def run_deconvolution(peaks, charge_range, tolerance, tolerance_type, max_left_d
 
 
 dpeaks = run_deconvolution(
-    peaks,
+    np.column_stack((mz_array, intensity_array)),
     (min_charge, max_charge),
     deconvolute_tolerance,
     tolerance_type,
@@ -125,132 +180,162 @@ dpeaks = run_deconvolution(
     max_right_intensity_decrease
 )
 
-peaks_df = pd.DataFrame()
-peaks_df['base_mz'] = [dpeak.base_peak.mz for dpeak in dpeaks]
-peaks_df['total_intensity'] = [dpeak.total_intensity for dpeak in dpeaks]
-peaks_df['base_neutral_mass'] = [peak.base_peak_neutral_mass(charge_carrier) for peak in dpeaks]
-peaks_df['charge'] = [peak.charge for peak in dpeaks]
-peaks_df['num_peaks'] = [peak.num_peaks for peak in dpeaks]
-peaks_df['peak_mzs'] = [';'.join([f'{p.mz:.4f}' for p in peak.peaks]) for peak in dpeaks]
-peaks_df['peak_intensities'] = [';'.join([f'{p.intensity:.1f}' for p in peak.peaks]) for peak in dpeaks]
-peaks_df['gap_ppm_errors'] = [';'.join([f'{gap:.2f}' for gap in peak.isotope_gaps_ppm_error]) for peak in dpeaks]
-
-
-
-
-# Handle missing charges by filling with 0 or a placeholder value
-peaks_df['charge'] = peaks_df['charge'].fillna(0)  # Use 0 or a designated value for None
-
-fig = go.Figure()
+peaks_df = pd.DataFrame.from_records(
+    [
+        (
+            dpeak.base_peak.mz,
+            dpeak.total_intensity,
+            dpeak.base_peak_neutral_mass(charge_carrier),
+            dpeak.charge,
+            dpeak.num_peaks,
+            dpeak,
+        )
+        for dpeak in dpeaks
+    ],
+    columns=['base_mz', 'total_intensity', 'base_neutral_mass', 'charge', 'num_peaks', 'dpeak'],
+)
 
-fig.add_trace(go.Scatter(
-    x=sum([[mz, mz, None] for mz, intensity in peaks], []),
-    y=sum([[0, intensity, None] for mz, intensity in peaks], []),
-    mode='lines',
-    name='Raw Spectrum',
-    line=dict(color='gray'),
-    opacity=0.3,
-))
+# Unassigned charges are stored as <NA>
+peaks_df['charge'] = peaks_df['charge'].astype('Int8')
 
-# Normalize charge states to map to a colormap
-unique_charges = np.unique(peaks_df['charge'])
-norm = mcolors.Normalize(vmin=min(unique_charges), vmax=max(unique_charges))
-colormap = plt.get_cmap('viridis')  # Choose a colormap ('viridis', 'plasma', etc.)
+# sort by base m/z so the m/z range filter can use a binary search
+peaks_df = peaks_df.sort_values('base_mz', kind='stable', ignore_index=True)
+base_mz_array = peaks_df['base_mz'].to_numpy()
 
 # Assign a distinct color for None or 0 (unassigned charges)
 special_color = '#efc7a0'  # Light gray for None/NaN charges
 
-# Generate colors for each charge state
-charge_colors = {charge: mcolors.rgb2hex(colormap(norm(charge))) for charge in unique_charges}
-charge_colors[0] = special_color  # Explicitly assign color for charge = 0 (was None)
-
-# Map colors to charge states
-colors = [charge_colors.get(charge, special_color) for charge in peaks_df['charge']]
 
-# Plot each charge state as a separate trace
-for charge in unique_charges:
-    mask = peaks_df['charge'] == charge
-    mz_values = peaks_df['base_mz'][mask]
-    intensity_values = peaks_df['total_intensity'][mask]
-
-    fig.add_trace(go.Scatter(
-        x=sum([[mz, mz, None] for mz in mz_values], []),
-        y=sum([[0, intensity, None] for intensity in intensity_values], []),
+@st.cache_data(show_spinner=False)
+def get_charge_colors(unique_charges):
+    """
+    Maps each charge state to a color from the viridis colormap, with
+    special_color for unassigned (0) charges.
+    """
+    # Normalize charge states to map to a colormap
+    norm = mcolors.Normalize(vmin=min(unique_charges), vmax=max(unique_charges))
+    colormap = plt.get_cmap('viridis')  # Choose a colormap ('viridis', 'plasma', etc.)
+
+    # Generate colors for each charge state
+    charge_colors = {charge: mcolors.rgb2hex(colormap(norm(charge))) for charge in unique_charges}
+    charge_colors[0] = special_color  # Explicitly assign color for charge = 0 (was None)
+    return charge_colors
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def build_figure(mz_array, intensity_array, peaks_df):
+    """
+    Builds the raw + deconvoluted spectrum figure. The result is shared across
+    reruns, so callers must copy it before changing the layout.
+    """
+    fig = go.Figure()
+
+    raw_x, raw_y = stems(mz_array, intensity_array)
+    fig.add_trace(go.Scattergl(
+        x=raw_x,
+        y=raw_y,
         mode='lines',
-        name=f'+{int(charge)} Peaks' if charge > 0 else '+? Peaks',
-        line=dict(color=charge_colors[charge], width=2),
-        hovertext=sum([
-            [
-                f'Charge: {charge}<br>Base m/z: {mz}<br>Total Intensity: {intensity}',
-                f'Charge: {charge}<br>Base m/z: {mz}<br>Total Intensity: {intensity}',
-                None
-            ]
-            for mz, intensity in zip(
-                mz_values,
-                intensity_values,
-            )
-        ], [])
+        name='Raw Spectrum',
+        line=dict(color='gray'),
+        opacity=0.3,
     ))
 
-fig.update_layout(
-    title='Deconvoluted Spectrum',
-    width=800,
-    height=450,
-    legend=dict(
-        x=0.02,  # Horizontal position (0 = left, 1 = right)
-        y=0.98,  # Vertical position (0 = bottom, 1 = top)
-        xanchor='left',
-        yanchor='top',
-        bgcolor='rgba(255,255,255,0.5)',  # Semi-transparent background
+    # Handle missing charges by filling with 0 for the color and trace lookup
+    peaks_df = peaks_df.assign(charge=peaks_df['charge'].fillna(0))
+
+    unique_charges = pd.unique(peaks_df['charge'])
+    charge_colors = get_charge_colors(tuple(unique_charges.tolist()))
+
+    # Plot each charge state as a separate trace
+    for charge, charge_df in peaks_df.groupby('charge'):
+        mz_values = charge_df['base_mz'].to_numpy()
+        intensity_values = charge_df['total_intensity'].to_numpy()
+
+        stem_x, stem_y = stems(mz_values, intensity_values)
+        fig.add_trace(go.Scattergl(
+            x=stem_x,
+            y=stem_y,
+            mode='lines',
+            name=f'+{int(charge)} Peaks' if charge > 0 else '+? Peaks',
+            line=dict(color=charge_colors[charge], width=2),
+            hovertext=stem_hovertext([
+                f'Charge: {charge}<br>Base m/z: {mz}<br>Total Intensity: {intensity}'
+                for mz, intensity in zip(mz_values, intensity_values)
+            ])
+        ))
+
+    fig.update_layout(
+        title='Deconvoluted Spectrum',
+        width=800,
+        height=450,
+        legend=dict(
+            x=0.02,  # Horizontal position (0 = left, 1 = right)
+            y=0.98,  # Vertical position (0 = bottom, 1 = top)
+            xanchor='left',
+            yanchor='top',
+            bgcolor='rgba(255,255,255,0.5)',  # Semi-transparent background
+        )
+
     )
+    return fig
 
-)
 
 # show peaks in original spectrum (count) and then in the deconvoluted spectrum
 
 st.subheader('Deconvolution Results', divider=True)
 
 c1, c2, c3 = st.columns(3)
-c1.metric('Original Peaks', len(peaks),
+c1.metric('Original Peaks', len(mz_array),
           help='Number of peaks in the original spectrum (After filtering by min intensity)')
 c2.metric('Deconvoluted Peaks', len(peaks_df), help='Number of peaks in the deconvoluted spectrum')
 
 # peaks with valid charge
-valid_peaks = peaks_df[peaks_df['charge'] != 0]
+valid_peaks = peaks_df[peaks_df['charge'].notna()]
 c3.metric('Valid Peaks', len(valid_peaks), help='Number of peaks with a valid charge state')
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def to_csv_bytes(df):
+    """
+    Encodes the table for the download button, reusing the result while the
+    filtered table is unchanged.
+    """
+    return df.to_csv(index=False).encode()
+
+
 @st.fragment
 def display():
-    min_peak_mz = min([peak[0] for peak in peaks])
-    max_peak_mz = max([peak[0] for peak in peaks])
+    # mz_array is sorted, so the range is just its endpoints
+    min_peak_mz = float(mz_array[0])
+    max_peak_mz = float(mz_array[-1])
 
     filter_min_mz, filter_max_mz = st.slider('Select a range of m/z', min_peak_mz, max_peak_mz,
                                              (min_peak_mz, max_peak_mz))
 
-    peaks_df_filtered = peaks_df[
-        (peaks_df['base_mz'] >= filter_min_mz) & (peaks_df['base_mz'] <= filter_max_mz)]
+    lo = np.searchsorted(base_mz_array, filter_min_mz, side='left')
+    hi = np.searchsorted(base_mz_array, filter_max_mz, side='right')
+    peaks_df_filtered = peaks_df.iloc[lo:hi]
     max_intensity = max(peaks_df_filtered['total_intensity'])
     # zoom into plotly plot and filter df
 
+    # copy the cached figure so the axis ranges don't leak into other sessions
+    fig = go.Figure(build_figure(mz_array, intensity_array, peaks_df[['base_mz', 'total_intensity', 'charge']]))
     fig.update_layout(xaxis=dict(range=[filter_min_mz, filter_max_mz]), yaxis=dict(range=[0, max_intensity]))
     st.plotly_chart(fig, use_container_width=True)
 
-    # set 0 chareg state to None:
-    peaks_df_filtered['charge'] = peaks_df_filtered['charge'].replace(0, None)
-
-    all_gap_errors = []
-    for errors in peaks_df_filtered['gap_ppm_errors']:
-        if errors:
-            all_gap_errors.extend([float(error) for error in errors.split(';')])
-
-
+    # format the isotope columns only for the peaks inside the m/z range
+    filtered_dpeaks = peaks_df_filtered['dpeak']
+    peaks_df_filtered = peaks_df_filtered.drop(columns='dpeak').assign(
+        peak_mzs=[';'.join([f'{p.mz:.4f}' for p in dpeak.peaks]) for dpeak in filtered_dpeaks],
+        peak_intensities=[';'.join([f'{p.intensity:.1f}' for p in dpeak.peaks]) for dpeak in filtered_dpeaks],
+        gap_ppm_errors=[';'.join([f'{gap:.2f}' for gap in dpeak.isotope_gaps_ppm_error]) for dpeak in filtered_dpeaks],
+    )
 
     st.dataframe(peaks_df_filtered, use_container_width=True, hide_index=True)
 
     # download table
     st.download_button(
         label="Download Table",
-        data=peaks_df_filtered.to_csv(index=False),
+        data=to_csv_bytes(peaks_df_filtered),
         file_name="deconvoluted_peaks.csv",
         mime="text/csv",
         use_container_width=True,
@@ -261,11 +346,13 @@ def display():
     if show_gap_statistic:
 
         st.subheader('Isotope Gap Statistics', divider=True)
+        all_gap_errors = np.concatenate([dpeak.isotope_gaps_ppm_error for dpeak in filtered_dpeaks])
+
         # write a metric for eman, median and std of the gap errors
         c1, c2, c3 = st.columns(3)
-        c1.metric('Mean Gap Error', f"{np.mean(all_gap_errors):.2f} ppm")
+        c1.metric('Mean Gap Error', f"{all_gap_errors.mean():.2f} ppm")
         c2.metric('Median Gap Error', f"{np.median(all_gap_errors):.2f} ppm")
-        c3.metric('Std. Dev. Gap Error', f"{np.std(all_gap_errors):.2f} ppm")
+        c3.metric('Std. Dev. Gap Error', f"{all_gap_errors.std():.2f} ppm")
 
         fig_hist = go.Figure()
         fig_hist.add_trace(go.Histogram(
@@ -0,0 +1,12 @@
+from msdecon import deconvolute
+from msdecon.data_structures import NEUTRON_MASS
+
+
+def test_envelope_tying_with_seed_keeps_charge():
+    # The zero-intensity isotope leaves the envelope's total equal to the seed
+    # alone; the navigated envelope must still win, as with max() over charges
+    peaks = [(500.0, 10.0), (500.0 + NEUTRON_MASS / 3, 0.0)]
+
+    dpeaks = deconvolute(peaks, charge_range=(2, 3), max_left_decrease=1.5, max_right_decrease=1.5)
+
+    assert [([p.index for p in d.peaks], d.charge) for d in dpeaks] == [([0, 1], 3)]
@@ -0,0 +1,9 @@
+import pytest
+
+from msdecon.graph_ops import construct_graph
+
+
+@pytest.mark.parametrize('charge_range', [(0, 3), (-1, 2), (3, 1)])
+def test_invalid_charge_range_raises(charge_range):
+    with pytest.raises(ValueError):
+        construct_graph([(500.0, 10.0), (500.5, 5.0)], 50, 'ppm', charge_range)